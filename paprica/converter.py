@@ -10,15 +10,65 @@ By using this code you agree to the terms of the software license agreement.
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pyapr
+from joblib import Parallel, delayed, effective_n_jobs, parallel_backend
 from skimage.io import imsave
 from tqdm import tqdm
 
 import paprica
 
 
+def _load_tile(tile, memmap_dir=None):
+    """
+    Load the given tile and return it (used to load tiles in a background thread).
+
+    Parameters
+    ----------
+    tile: tileLoader
+        tile to be loaded.
+    memmap_dir: str
+        folder used to memory map the tile pixel data (None to load it in RAM).
+
+    Returns
+    -------
+    tile: tileLoader
+        loaded tile.
+    """
+    tile.memmap_dir = memmap_dir
+    tile.load_tile()
+    return tile
+
+
+def _prefetch_tiles(tiles, memmap_dir=None):
+    """
+    Generator yielding loaded tiles. The next tile is loaded in a background thread while the current one is
+    processed, so that reading from disk overlaps with the conversion. At most one tile is loaded ahead.
+
+    Parameters
+    ----------
+    tiles: baseParser
+        parser object referencing tiles to be loaded.
+    memmap_dir: str
+        folder used to memory map the tile pixel data (None to load it in RAM).
+
+    Returns
+    -------
+    Generator containing the loaded tileLoader objects.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = None
+        for tile in tiles:
+            loading = executor.submit(_load_tile, tile, memmap_dir)
+            if pending is not None:
+                yield pending.result()
+            pending = loading
+        if pending is not None:
+            yield pending.result()
+
+
 class tileConverter():
     """
     Class to convert tiles to APR or to tiff.
@@ -48,6 +98,8 @@ class tileConverter():
         self.bg = None
         self.quantization_factor = None
 
+        self.memmap_dir = None
+
     def set_compression(self, quantization_factor=1, bg=108):
         """
         Activate B3D compression for saving tiles.
@@ -82,6 +134,36 @@ class tileConverter():
         self.bg = None
         self.quantization_factor = None
 
+    def set_memmap(self, path):
+        """
+        Load tiff sequences in a memory mapped temporary file instead of RAM during conversion. The OS can then
+        evict planes of the tile being converted from memory, which lowers the peak memory usage for large tiles.
+        Temporary files are deleted as soon as each tile is converted.
+
+        Parameters
+        ----------
+        path: str
+            folder where temporary files are created (it should be on a fast local disk with enough free space
+            to hold two tiles, or n_jobs tiles when batch_convert_to_apr is run with n_jobs > 1).
+
+        Returns
+        -------
+        None
+        """
+
+        self.memmap_dir = path
+
+    def deactivate_memmap(self):
+        """
+        Load tiff sequences in RAM during conversion.
+
+        Returns
+        -------
+        None
+        """
+
+        self.memmap_dir = None
+
     def batch_convert_to_apr(self,
                              Ip_th=108,
                              rel_error=0.2,
@@ -92,6 +174,7 @@ class tileConverter():
                              path=None,
                              lazy_loading=True,
                              tree_mode='mean',
+                             n_jobs=1,
                              progress_bar=True):
         """
         Convert all parsed tiles to APR using auto-parameters.
@@ -118,6 +201,11 @@ class tileConverter():
             the APR. It will require about 1/7 more storage.
         tree_mode: str ('mean' or 'max')
             controls how downsampled particles are computed. Either the mean or the max is taken.
+        n_jobs: int
+            number of tiles converted in parallel (negative values follow joblib convention, -1 uses all cores).
+            Each worker holds a whole tile in memory (or in a temporary file if set_memmap was used, so up to n_jobs
+            temporary stacks exist at once) so it should be set according to the available RAM. If 1, tiles are
+            converted sequentially while the next tile is loaded in the background (two tiles held at once).
 
         Returns
         -------
@@ -141,53 +229,26 @@ class tileConverter():
             folder_apr = path
         Path(folder_apr).mkdir(parents=True, exist_ok=True)
 
-        for tile in tqdm(self.tiles, desc='Converting tiles', disable=not progress_bar):
-            tile.load_tile()
-
-            # Set parameters
-            par = pyapr.APRParameters()
-            par.Ip_th = Ip_th
-            par.rel_error = rel_error
-            par.dx = dx
-            par.dy = dy
-            par.dz = dz
-            par.gradient_smoothing = gradient_smoothing
-            par.auto_parameters = True
-
-            # Convert tile to APR and save
-            apr = pyapr.APR()
-            parts = pyapr.ShortParticles()
-            converter = pyapr.converter.FloatConverter()
-            converter.set_parameters(par)
-            converter.verbose = True
-            converter.get_apr(apr, tile.data)
-            parts.sample_image(apr, tile.data)
-
-            if self.compression:
-                parts.set_compression_type(1)
-                parts.set_quantization_factor(self.quantization_factor)
-                parts.set_background(self.bg)
-
-            if lazy_loading:
-                if tree_mode == 'mean':
-                    tree_parts = pyapr.tree.fill_tree_mean(apr, parts)
-                elif tree_mode == 'max':
-                    tree_parts = pyapr.tree.fill_tree_max(apr, parts)
-            else:
-                tree_parts = None
-
-            # Save converted data
-            if not self.is_multitile:
-                if tile.type == 'tiff2D':
-                    basename, filename = os.path.split(tile.path[:-1])
-                    pyapr.io.write(os.path.join(folder_apr, filename + '.apr'), apr, parts, tree_parts=tree_parts)
-                else:
-                    basename, filename = os.path.split(tile.path)
-                    pyapr.io.write(os.path.join(folder_apr, filename[:-4] + '.apr'), apr, parts, tree_parts=tree_parts)
-            else:
-                filename = '{}_{}.apr'.format(tile.row, tile.col)
-                pyapr.io.write(os.path.join(folder_apr, filename),
-                               apr, parts, tree_parts=tree_parts)
+        par = {'Ip_th': Ip_th,
+               'rel_error': rel_error,
+               'gradient_smoothing': gradient_smoothing,
+               'dx': dx,
+               'dy': dy,
+               'dz': dz}
+
+        if n_jobs == 1:
+            for tile in tqdm(_prefetch_tiles(self.tiles, self.memmap_dir), total=self.n_tiles, desc='Converting tiles',
+                             disable=not progress_bar):
+                self._convert_tile(tile, folder_apr, par, lazy_loading, tree_mode)
+        else:
+            # Split the cores between workers so that pyapr OpenMP threads and tiff reading threads do not
+            # oversubscribe the CPU
+            n_workers = effective_n_jobs(n_jobs)
+            n_threads = max(1, os.cpu_count() // n_workers)
+            with parallel_backend('loky', inner_max_num_threads=n_threads):
+                Parallel(n_jobs=n_jobs, verbose=10 if progress_bar else 0)(
+                    delayed(self._convert_tile)(tile, folder_apr, par, lazy_loading, tree_mode, n_threads)
+                    for tile in self.tiles)
 
         if self.is_multitile:
             # Modify tileParser object to use APR instead
@@ -236,3 +297,82 @@ class tileConverter():
             else:
                 filename = '{}_{}.tif'.format(tile.row, tile.col)
                 imsave(os.path.join(folder_tiff, filename), data, check_contrast=False)
+
+    def _convert_tile(self, tile, folder_apr, par, lazy_loading, tree_mode, n_threads=None):
+        """
+        Convert a single tile to APR and save it in folder_apr.
+
+        Parameters
+        ----------
+        tile: tileLoader
+            tile to be converted (it is loaded if not already loaded).
+        folder_apr: str
+            folder where the APR file is saved.
+        par: dict
+            APR parameters (Ip_th, rel_error, gradient_smoothing, dx, dy, dz).
+        lazy_loading: bool
+            if true the tree particles are computed and saved along with the APR.
+        tree_mode: str ('mean' or 'max')
+            controls how downsampled particles are computed.
+        n_threads: int
+            number of threads used to read tiff sequences (None to use all cores).
+
+        Returns
+        -------
+        None
+        """
+        tile.memmap_dir = self.memmap_dir
+        tile.n_threads = n_threads
+        tile.load_tile()
+
+        # Set parameters
+        apr_par = pyapr.APRParameters()
+        apr_par.Ip_th = par['Ip_th']
+        apr_par.rel_error = par['rel_error']
+        apr_par.dx = par['dx']
+        apr_par.dy = par['dy']
+        apr_par.dz = par['dz']
+        apr_par.gradient_smoothing = par['gradient_smoothing']
+        apr_par.auto_parameters = True
+
+        # Convert tile to APR and save
+        apr = pyapr.APR()
+        parts = pyapr.ShortParticles()
+        converter = pyapr.converter.FloatConverter()
+        converter.set_parameters(apr_par)
+        converter.verbose = True
+        converter.get_apr(apr, tile.data)
+        parts.sample_image(apr, tile.data)
+
+        if self.compression:
+            parts.set_compression_type(1)
+            parts.set_quantization_factor(self.quantization_factor)
+            parts.set_background(self.bg)
+
+        if lazy_loading:
+            if tree_mode == 'mean':
+                tree_parts = pyapr.tree.fill_tree_mean(apr, parts)
+            elif tree_mode == 'max':
+                tree_parts = pyapr.tree.fill_tree_max(apr, parts)
+            if self.compression:
+                tree_parts.set_compression_type(1)
+                tree_parts.set_quantization_factor(self.quantization_factor)
+                tree_parts.set_background(self.bg)
+        else:
+            tree_parts = None
+
+        # Save converted data
+        if not self.is_multitile:
+            if tile.type == 'tiff2D':
+                basename, filename = os.path.split(tile.path[:-1])
+                pyapr.io.write(os.path.join(folder_apr, filename + '.apr'), apr, parts, tree_parts=tree_parts)
+            else:
+                basename, filename = os.path.split(tile.path)
+                pyapr.io.write(os.path.join(folder_apr, filename[:-4] + '.apr'), apr, parts, tree_parts=tree_parts)
+        else:
+            filename = '{}_{}.apr'.format(tile.row, tile.col)
+            pyapr.io.write(os.path.join(folder_apr, filename),
+                           apr, parts, tree_parts=tree_parts)
+
+        # Release pixel data now, the tile object can outlive this call (e.g. while the next tile is prefetched)
+        tile.data = None
@@ -11,11 +11,14 @@ By using this code you agree to the terms of the software license agreement.
 
 import os
 import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from glob import glob
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pyapr
+import tifffile
 from skimage.io import imread
 from tqdm import tqdm
 
@@ -81,6 +84,56 @@ def tile_from_path(path):
                       channel=None)
 
 
+def load_sequence(files, memmap_dir=None, n_threads=None):
+    """
+    Load a sequence of 2D tiff files and return it as a 3D array. Frames are read in parallel threads
+    (tifffile releases the GIL while reading). Uncompressed frames are read directly into their plane of the
+    output array, compressed frames are decoded first and then copied.
+
+    Parameters
+    ----------
+    files: list[str]
+        sorted list of the frames to be loaded.
+    memmap_dir: str
+        if not None, the array is backed by an anonymous temporary file in this folder so that the OS can evict
+        planes from memory (e.g. while the data is being converted). The file is removed when the array is released.
+    n_threads: int
+        number of threads used to read the frames (None to use all cores).
+
+    Returns
+    -------
+    v: array_like
+        numpy array containing the data (empty if no file is given).
+    """
+    if len(files) == 0:
+        return np.empty((0, 0, 0), dtype='uint16')
+
+    # Frame shape and dtype are read from the first file header so that no frame is decoded twice. Frames can
+    # be read in place if they are stored uncompressed (compression tag 1).
+    with tifffile.TiffFile(files[0]) as tif:
+        page = tif.pages[0]
+        shape, dtype = page.shape, page.dtype
+        read_in_place = page.compression == 1
+
+    n_files = len(files)
+    if memmap_dir is None:
+        v = np.empty((n_files, *shape), dtype=dtype)
+    else:
+        v = np.memmap(tempfile.TemporaryFile(dir=memmap_dir), dtype=dtype, mode='w+', shape=(n_files, *shape))
+
+    with ThreadPoolExecutor(max_workers=n_threads or os.cpu_count()) as executor:
+        if read_in_place:
+            frames = executor.map(lambda plane, f: tifffile.imread(f, out=plane), v, files)
+            for _ in tqdm(frames, total=n_files, desc='Loading sequence', leave=False):
+                pass
+        else:
+            frames = executor.map(tifffile.imread, files)
+            for i, u in enumerate(tqdm(frames, total=n_files, desc='Loading sequence', leave=False)):
+                v[i] = u
+
+    return v
+
+
 class tileLoader():
     """
     Class to load each tile, neighboring tiles, segmentation and neighboring segmentation.
@@ -158,6 +211,8 @@ class tileLoader():
         self.parts = None                   # Particles
         self.parts_cc = None                # Connected component
         self.lazy_data = None               # Lazy reconstructed data
+        self.memmap_dir = None              # If set, tiff sequences are loaded in a temporary file in this folder
+        self.n_threads = None               # Number of threads used to read tiff sequences (None for all cores)
 
         # Initialize attributes to load neighbors data
         self.data_neighbors = None
@@ -238,11 +293,45 @@ class tileLoader():
         """
         if self.parts_cc is None:
             self.parts_cc = pyapr.io.read_particles(self.path, parts_name='segmentation cc')
-            if load_tree:
+            if load_tree and self.apr is None:
                 self.apr = pyapr.io.read_apr(self.path)
         else:
             print('Tile cc already loaded.')
 
+    def load_tile_and_segmentation(self):
+        """
+        Load the current tile and its connected component (cc) using a single file handle. Note: data must be of type
+        APR.
+
+        Returns
+        -------
+        None
+        """
+        if self.type != 'apr':
+            raise TypeError('Error: segmentation can only be loaded for APR data.')
+
+        if self.parts is not None and self.parts_cc is not None:
+            print('Tile and tile cc already loaded.')
+            return
+
+        aprfile = pyapr.io.APRFile()
+        aprfile.set_read_write_tree(True)
+        aprfile.open(self.path, 'READ')
+        try:
+            if self.apr is None:
+                self.apr = pyapr.APR()
+                aprfile.read_apr(self.apr, t=0, channel_name='t')
+            # The APR can already be loaded without its particles (e.g. by load_segmentation(load_tree=True))
+            if self.parts is None:
+                self.parts = pyapr.ShortParticles()
+                aprfile.read_particles(self.apr, 'particles', self.parts, t=0)
+            if self.parts_cc is None:
+                self.parts_cc = pyapr.LongParticles()
+                aprfile.read_particles(self.apr, 'segmentation cc', self.parts_cc, t=0)
+        finally:
+            aprfile.close()
+        self.is_loaded = True
+
     def lazy_load_segmentation(self, level_delta=0):
         """
         Load the parts_cc lazily at the given resolution.
@@ -275,14 +364,16 @@ class tileLoader():
             if self.type == 'apr':
                 aprs = []
                 ccs = []
+                # Neighbors APR trees are only read from disk if they were not already loaded by load_neighbors()
+                read_tree = load_tree and self.apr_neighbors is None
                 for i, path_neighbor in enumerate(self.neighbors_path):
-                    if not load_tree:
+                    if not read_tree:
                         apr = self.apr_neighbors[i]
                     cc = pyapr.LongParticles()
                     aprfile = pyapr.io.APRFile()
                     aprfile.set_read_write_tree(True)
                     aprfile.open(path_neighbor, 'READ')
-                    if load_tree:
+                    if read_tree:
                         apr = pyapr.APR()
                         aprfile.read_apr(apr, t=0, channel_name='t')
                     aprfile.read_particles(apr, 'segmentation cc', cc, t=0)
@@ -372,6 +463,8 @@ class tileLoader():
             u = self._load_colm(path)
         elif self.type == 'clearscope':
             u = self._load_clearscope(path)
+        elif self.type == 'tiff2D':
+            u = load_sequence(sorted(glob(os.path.join(path, '*.tif'))), memmap_dir=self.memmap_dir, n_threads=self.n_threads)
         elif self.type == 'tiff3D':
             u = imread(path)
         elif self.type == 'apr':
@@ -388,7 +481,7 @@ class tileLoader():
 
     def _load_raw(self, path):
         """
-        Load raw data at given path.
+        Load raw data at given path as a memory mapped array.
 
         Parameters
         ----------
@@ -400,7 +493,9 @@ class tileLoader():
         u: array_like
             numpy array containing the data.
         """
-        u = np.fromfile(path, dtype='uint16', count=-1)
+        # Memory map the file so that planes are paged in on demand instead of reading the whole file upfront.
+        # Copy-on-write mode keeps the array writable without ever modifying the file on disk.
+        u = np.memmap(path, dtype='uint16', mode='c')
         return u.reshape((-1, self.frame_size, self.frame_size))
 
     def _load_colm(self, path):
@@ -417,12 +512,13 @@ class tileLoader():
         v: array_like
             numpy array containing the data.
         """
-        files_sorted = sorted(glob(os.path.join(path, '*CHN0' + str(self.channel) + '_*tif')))
-        n_files = len(files_sorted)
-        v = np.empty((n_files, self.frame_size, self.frame_size), dtype='uint16')
-        for i, f in enumerate(tqdm(files_sorted, desc='Loading sequence', leave=False)):
-            v[i] = imread(f)
-        return v
+        # Filter directory entries directly instead of expanding a glob pattern, this avoids a stat per file.
+        # Hidden files (e.g. macOS '._' AppleDouble files) are skipped as they were by glob.
+        channel_tag = 'CHN0{}_'.format(self.channel)
+        with os.scandir(path) as it:
+            files_sorted = sorted(e.path for e in it if channel_tag in e.name and e.name.endswith('tif')
+                                  and not e.name.startswith('.') and e.is_file())
+        return load_sequence(files_sorted, memmap_dir=self.memmap_dir, n_threads=self.n_threads)
 
     def _load_clearscope(self, path):
         """
@@ -439,12 +535,7 @@ class tileLoader():
             numpy array containing the data.
         """
         files_sorted = sorted(glob(os.path.join(path, '*')))
-        n_files = len(files_sorted)
-        v = np.empty((n_files, self.frame_size, self.frame_size), dtype='uint16')
-        for i, f in enumerate(tqdm(files_sorted, desc='Loading sequence', leave=False)):
-            v[i] = imread(f)
-
-        return v
+        return load_sequence(files_sorted, memmap_dir=self.memmap_dir, n_threads=self.n_threads)
 
     # def _load_mesospim(self, path):
     #     """
@@ -29,11 +29,84 @@ import warnings
 
 import pyapr
 import numpy as np
+from joblib import Parallel, delayed
 from skimage.io import imread, imsave
 from tqdm import tqdm
 
 import paprica
 
+_RE_ACQ = re.compile(r'^(\w+)\s*=\s*(.*?)\s*$')
+
+
+def _parse_setting_value(value):
+    """
+    Convert a value read in the acquisition settings file to bool, int or float if possible.
+
+    Parameters
+    ----------
+    value: str
+        value as written in the settings file
+
+    Returns
+    -------
+    _: bool, int, float or str
+        converted value (the input string if it is not a boolean or a number)
+    """
+    if value == 'True':
+        return True
+    if value == 'False':
+        return False
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _parse_settings_lines(lines):
+    """
+    Parse the lines of a ClearScope acquisition settings file ('key = value' lines).
+
+    Parameters
+    ----------
+    lines: list[str]
+        lines of the settings file
+
+    Returns
+    -------
+    acq_param: dict
+        dictionary containing the parsed settings (values converted with _parse_setting_value)
+    """
+    matches = (_RE_ACQ.match(l) for l in lines)
+    return {m.group(1): _parse_setting_value(m.group(2)) for m in matches if m is not None}
+
+
+def _get_tile_size(tile):
+    """
+    Returns the number of particles and the number of pixels of an APR tile.
+
+    Parameters
+    ----------
+    tile: tileLoader
+        tile to be measured
+
+    Returns
+    -------
+    (n_parts, n_pixels): tuple
+        number of particles and number of pixels of the tile
+    """
+    try:
+        tile.lazy_load_tile()
+        return tile.lazy_data.parts.dataset_size(), np.prod(tile.lazy_data.shape)
+    except: #Lazy loading not available
+        # Only the APR structure is needed, particles are not read
+        apr = pyapr.io.read_apr(tile.path)
+        return apr.total_number_particles(), np.prod(apr.shape())
+
+
 def get_microscope_list():
     """
     This function builds up a dict containing microscopes supported by the pipeline (refer to the documentation to add yours).
@@ -161,10 +234,17 @@ class baseParser():
         if cnt == 0:
             print('All tiles are readable.')
 
-    def compute_average_CR(self, progress_bar=True):
+    def compute_average_CR(self, progress_bar=True, n_jobs=1):
         """
         Compute the average Computational Ratio (CR). Note: data must be of type APR.
 
+        Parameters
+        ----------
+        progress_bar: bool
+            option to display progress bar
+        n_jobs: int
+            number of processes used to read the tiles (-1 for all cores)
+
         Returns
         -------
         cr: float
@@ -175,19 +255,14 @@ class baseParser():
             warnings.warn('Data-set should be of type APR to compute CR, returning 1.')
             return 1
 
-        n_parts = []
-        n_pixels = []
-        try:
-            for tile in tqdm(self, desc='Computing CR', disable=not progress_bar):
-                tile.lazy_load_tile()
-                n_parts.append(tile.lazy_data.parts.dataset_size())
-                n_pixels.append(np.prod(tile.lazy_data.shape))
-
-        except: #Lazy loading not available
-            for tile in tqdm(self, desc='Computing CR', disable=not progress_bar):
-                tile.load_tile()
-                n_parts.append(len(tile.parts))
-                n_pixels.append(np.prod(tile.apr.shape()))
+        if n_jobs == 1:
+            sizes = [_get_tile_size(tile)
+                     for tile in tqdm(self, desc='Computing CR', total=self.n_tiles, disable=not progress_bar)]
+        else:
+            # Progress is reported by joblib as tasks complete
+            sizes = Parallel(n_jobs=n_jobs, backend='loky', verbose=10 if progress_bar else 0)(
+                delayed(_get_tile_size)(tile) for tile in self)
+        n_parts, n_pixels = zip(*sizes)
 
         return np.sum(n_pixels)/np.sum(n_parts)
 
@@ -375,16 +450,7 @@ class baseParser():
         Sort tiles so that they are arranged in columns and rows (read from left to right and top to bottom).
 
         """
-        tiles_sorted = []
-        for v in range(self.nrow):
-            for h in range(self.ncol):
-                for i, t in enumerate(self.tiles_list):
-                    if t['col']==h and t['row']==v:
-                        tiles_sorted.append(t)
-                        self.tiles_list.pop(i)
-                        break
-
-        self.tiles_list = tiles_sorted
+        self.tiles_list = sorted(self.tiles_list, key=lambda t: (t['row'], t['col']))
 
     def __getitem__(self, item):
         """
@@ -862,18 +928,7 @@ class clearscopeParser(tileParser):
         with open(path) as f:
             lines = f.readlines()
 
-        self.acq_param = {}
-        for l in lines:
-            pattern_matched = re.match(r'^(\w*) = (.*)$', l)
-            if pattern_matched is not None:
-                if pattern_matched.group(2).isnumeric():
-                    self.acq_param[pattern_matched.group(1)] = float(pattern_matched.group(2))
-                elif pattern_matched.group(2) == 'True':
-                    self.acq_param[pattern_matched.group(1)] = True
-                elif pattern_matched.group(2) == 'False':
-                    self.acq_param[pattern_matched.group(1)] = False
-                else:
-                    self.acq_param[pattern_matched.group(1)] = pattern_matched.group(2)
+        self.acq_param = _parse_settings_lines(lines)
 
         self.nrow = int(self.acq_param['ScanGridY'])
         self.ncol = int(self.acq_param['ScanGridX'])
@@ -926,11 +981,10 @@ class clearscopeParser(tileParser):
             col number
         """
 
-        col = np.absolute(np.mod(n - self.ncol - 1, 2 * self.ncol) - self.ncol + 0.5) + 0.5
-        row = np.ceil(n / self.ncol)
-
-        col = int(col-1)
-        row = int(row-1)
+        # Tiles are acquired in a snake pattern: left to right on even rows and right to left on odd rows
+        k = (n - self.ncol - 1) % (2 * self.ncol) - self.ncol
+        col = k if k >= 0 else -k - 1
+        row = (n - 1) // self.ncol
 
         return row, col
 
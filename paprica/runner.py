@@ -27,8 +27,12 @@ from skimage.color import hsv2rgb
 from tqdm import tqdm
 
 import paprica
+from paprica.parser import _parse_settings_lines
 from paprica.stitcher import _get_max_proj_apr, _get_proj_shifts, _get_masked_proj_shifts
 
+_RE_ROW_COL = re.compile(r'\d{6}_(\d{6})___\dc')
+_RE_CHANNEL = re.compile(r'\d{6}_\d{6}___(\d)c')
+
 
 class clearscopeRunningPipeline():
 
@@ -163,6 +167,8 @@ class clearscopeRunningPipeline():
                     if self.converter is not None:
                         self._convert_to_apr(tile)
                         self._check_conversion(tile)
+                        # Pixel data is not needed anymore and would otherwise be kept while waiting for next tile
+                        tile.data = None
                 else:
                     tile.apr = apr
                     tile.parts = parts
@@ -655,18 +661,7 @@ class clearscopeRunningPipeline():
         with open(path) as f:
             lines = f.readlines()
 
-        self.acq_param = {}
-        for l in lines:
-            pattern_matched = re.match(r'^(\w*) = (\S*)', l)
-            if pattern_matched is not None:
-                if pattern_matched.group(2).isnumeric():
-                    self.acq_param[pattern_matched.group(1)] = float(pattern_matched.group(2))
-                elif pattern_matched.group(2) == 'True':
-                    self.acq_param[pattern_matched.group(1)] = True
-                elif pattern_matched.group(2) == 'False':
-                    self.acq_param[pattern_matched.group(1)] = False
-                else:
-                    self.acq_param[pattern_matched.group(1)] = pattern_matched.group(2)
+        self.acq_param = _parse_settings_lines(lines)
 
         self.nrow = int(self.acq_param['ScanGridY'])
         self.ncol = int(self.acq_param['ScanGridX'])
@@ -706,21 +701,18 @@ class clearscopeRunningPipeline():
         """
 
         expected_tile = os.path.join(self.path, '000000_{:06d}___{}c/'.format(self.current_tile, self.current_channel))
-        path = glob(expected_tile)
 
-        if path == []:
+        if not os.path.isdir(expected_tile):
             return False, None
-        elif len(path) == 1:
-            # Store current tile coordinate
-            files = glob(os.path.join(expected_tile, '*.tif'))
-            if len(files) < self.n_planes:
-                return False, None
-            else:
-                tile = self._get_tile(expected_tile)
 
-            return True, tile
-        else:
-            raise TypeError('Error: multiple tiles were found.')
+        # The tile is available once all its planes are written, count them without building the list of paths.
+        # Hidden files (e.g. macOS '._' AppleDouble files) are skipped as they were by glob.
+        with os.scandir(expected_tile) as it:
+            n_files = sum(1 for entry in it if entry.name.endswith('.tif') and not entry.name.startswith('.'))
+        if n_files < self.n_planes:
+            return False, None
+
+        return True, self._get_tile(expected_tile)
 
     def _get_row_col(self, path):
         """
@@ -737,16 +729,15 @@ class clearscopeRunningPipeline():
             row and col numbers
         """
 
-        pattern_search = re.findall(r'\d{6}_(\d{6})___\dc', path)
-
-        if pattern_search != []:
-            n = int(pattern_search[0])
+        pattern_search = _RE_ROW_COL.search(path)
 
-        col = np.absolute(np.mod(n - self.ncol - 1, 2 * self.ncol) - self.ncol + 0.5) + 0.5
-        row = np.ceil(n / self.ncol)
+        if pattern_search is not None:
+            n = int(pattern_search.group(1))
 
-        col = int(col-1)
-        row = int(row-1)
+        # Tiles are acquired in a snake pattern: left to right on even rows and right to left on odd rows
+        k = (n - self.ncol - 1) % (2 * self.ncol) - self.ncol
+        col = k if k >= 0 else -k - 1
+        row = (n - 1) // self.ncol
 
         return row, col
 
@@ -765,10 +756,10 @@ class clearscopeRunningPipeline():
             Channel number
         """
 
-        pattern_search = re.findall(r'\d{6}_\d{6}___(\d)c', path)
+        pattern_search = _RE_CHANNEL.search(path)
 
-        if pattern_search != []:
-            return int(pattern_search[0])
+        if pattern_search is not None:
+            return int(pattern_search.group(1))
 
     def _update_next_tile(self):
         """
@@ -1161,6 +1152,10 @@ class clearscopeRunningPipeline():
 
         if self.lazy_loading:
             tree_parts = pyapr.tree.fill_tree_mean(apr, parts)
+            if self.compression:
+                tree_parts.set_compression_type(1)
+                tree_parts.set_quantization_factor(self.quantization_factor)
+                tree_parts.set_background(self.bg)
         else:
             tree_parts = None
 
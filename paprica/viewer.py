@@ -7,8 +7,8 @@ By using this code you agree to the terms of the software license agreement.
 © Copyright 2020 Wyss Center for Bio and Neuro Engineering – All rights reserved
 """
 
-import os
-from glob import glob
+import copy
+from collections import OrderedDict
 
 import matplotlib.pyplot as plt
 import napari
@@ -20,12 +20,28 @@ from napari.layers import Image, Labels, Points
 from skimage.color import hsv2rgb
 from skimage.exposure import rescale_intensity
 from skimage.filters import gaussian
-from skimage.io import imread
 from skimage.transform import resize
 
 import paprica
 
 
+def _downsample_level(downsample):
+    """
+    Convert a downsampling factor to the corresponding APR level_delta (e.g. 4 -> -2).
+
+    Parameters
+    ----------
+    downsample: int
+        downsampling factor (1: full resolution, 2: 2x downsampling, 4: 4x downsampling..etc)
+
+    Returns
+    -------
+    level_delta: int
+        level_delta to be used for APR reconstruction
+    """
+    return int(-np.sign(downsample) * np.log2(np.abs(downsample)))
+
+
 def display_apr_from_path(path, **kwargs):
     """
     Display an APR using Napari from a filepath.
@@ -69,10 +85,35 @@ def display_apr(apr, parts, **kwargs):
     display_layers_pyramidal([l], level_delta=0)
 
 
+def _slicer_at_level(slicer, level_delta):
+    """
+    Returns a copy of an APRSlicer at another resolution. The copy shares the APR, particles and tree particles of
+    the original slicer (so the tree is not filled again) but has its own reconstruction patch and slice buffer.
+
+    Parameters
+    ----------
+    slicer: pyapr.reconstruction.APRSlicer
+        slicer to be copied
+    level_delta: int
+        resolution of the copy (see apr_to_napari_Image)
+
+    Returns
+    -------
+    out: pyapr.reconstruction.APRSlicer
+        slicer at the given resolution
+    """
+    out = copy.copy(slicer)
+    out.patch = pyapr.ReconPatch()
+    out.set_level_delta(level_delta)
+    out.new_empty_slice()
+    return out
+
+
 def apr_to_napari_Image(apr: pyapr.APR,
                         parts: (pyapr.ShortParticles, pyapr.FloatParticles),
                         mode: str = 'constant',
                         level_delta: int = 0,
+                        pyramid_levels: int = 0,
                         **kwargs):
     """
     Construct a napari 'Image' layer from an APR. Pixel values are reconstructed on the fly via the APRSlicer class.
@@ -92,6 +133,10 @@ def apr_to_napari_Image(apr: pyapr.APR,
         Sets the resolution of the reconstruction. The size of the image domain is multiplied by a factor of 2**level_delta.
         Thus, a value of 0 corresponds to the original pixel image resolution, -1 halves the resolution and +1 doubles it.
         (default: 0)
+    pyramid_levels: int
+        If > 0, build a napari multiscale Image with this number of levels, each level halving the resolution of the
+        previous one starting from level_delta. Napari then only reconstructs the level matching the current zoom.
+        (default: 0)
 
     Returns
     -------
@@ -110,10 +155,14 @@ def apr_to_napari_Image(apr: pyapr.APR,
         del kwargs['tree_mode']
     else:
         tree_mode = 'mean'
-    par = apr.get_parameters()
-    return Image(data=pyapr.reconstruction.APRSlicer(apr, parts, mode=mode, level_delta=level_delta, tree_mode=tree_mode),
-                 rgb=False, multiscale=False, contrast_limits=contrast_limits,
-                 scale=[par.dz, par.dx, par.dy], **kwargs)
+    if 'scale' not in kwargs:
+        par = apr.get_parameters()
+        kwargs['scale'] = [par.dz, par.dx, par.dy]
+    data = pyapr.reconstruction.APRSlicer(apr, parts, mode=mode, level_delta=level_delta, tree_mode=tree_mode)
+    if pyramid_levels > 0:
+        # The tree is filled once by the first slicer and shared by the coarser levels
+        data = [data] + [_slicer_at_level(data, level_delta-i) for i in range(1, pyramid_levels)]
+    return Image(data=data, rgb=False, multiscale=pyramid_levels > 0, contrast_limits=contrast_limits, **kwargs)
 
 
 def apr_to_napari_Labels(apr: pyapr.APR,
@@ -147,9 +196,11 @@ def apr_to_napari_Labels(apr: pyapr.APR,
     """
     if 'contrast_limits' in kwargs:
         del kwargs['contrast_limits']
-    par = apr.get_parameters()
+    if 'scale' not in kwargs:
+        par = apr.get_parameters()
+        kwargs['scale'] = [par.dz, par.dx, par.dy]
     return Labels(data=pyapr.reconstruction.APRSlicer(apr, parts, mode=mode, level_delta=level_delta, tree_mode='max'),
-                  multiscale=False, scale=[par.dz, par.dx, par.dy], **kwargs)
+                  multiscale=False, **kwargs)
 
 # Define a callback that will take the value of the slider and the viewer
 def resolution_callback(viewer, value):
@@ -170,8 +221,8 @@ def display_layers(layers):
 
     Parameters
     ----------
-    layers: list[napari.Layer]
-        list of layers to display
+    layers: list[napari.Layer] or generator
+        layers to display, a generator can be used to display each layer as soon as it is computed.
 
     Returns
     -------
@@ -179,9 +230,13 @@ def display_layers(layers):
         napari viewer.
     """
 
+    from qtpy.QtWidgets import QApplication
+
     viewer = napari.Viewer()
     for layer in layers:
         viewer.add_layer(layer)
+        # Paint each layer as soon as it is added
+        QApplication.processEvents()
 
     napari.run()
 
@@ -195,8 +250,8 @@ def display_layers_pyramidal(layers, level_delta):
 
     Parameters
     ----------
-    layers: list[napari.Layer]
-        list of layers to display
+    layers: list[napari.Layer] or generator
+        layers to display, a generator can be used to display each layer as soon as it is computed.
 
     Returns
     -------
@@ -204,17 +259,18 @@ def display_layers_pyramidal(layers, level_delta):
         napari viewer.
     """
 
+    from qtpy.QtCore import Qt
+    from qtpy.QtWidgets import QApplication, QSlider
+
     viewer = napari.Viewer()
     for layer in layers:
         viewer.add_layer(layer)
-
-    from qtpy.QtCore import Qt
-    from qtpy.QtWidgets import QSlider
-
+        # Paint each layer as soon as it is added
+        QApplication.processEvents()
 
     my_slider = QSlider(Qt.Horizontal)
     my_slider.setMinimum(0)
-    layers_apr = [l for l in layers if isinstance(l.data, pyapr.reconstruction.APRSlicer)]
+    layers_apr = [l for l in viewer.layers if isinstance(l.data, pyapr.reconstruction.APRSlicer)]
     l_max = np.min([l.data.apr.level_max() for l in layers_apr])
     l_min = 5 if l_max > 5 else 1
     my_slider.setMaximum(l_max-l_min)
@@ -292,14 +348,14 @@ def display_heatmap(heatmap, atlas=None, data=None, log=False):
         ax.set_yticks([])
     # If u is 3D then use napari but no colorbar for now
     elif heatmap.ndim == 3:
-        with napari.gui_qt():
-            viewer = napari.Viewer()
-            viewer.add_image(heatmap, colormap='inferno', name='Heatmap', blending='additive', opacity=0.7)
-            if atlas is not None:
-                viewer.add_labels(atlas, name='Atlas regions', opacity=0.7)
-            if data is not None:
-                viewer.add_image(data, name='Intensity data', blending='additive',
-                                 scale=np.array(heatmap.shape)/np.array(data.shape), opacity=0.7)
+        viewer = napari.Viewer()
+        viewer.add_image(heatmap, colormap='inferno', name='Heatmap', blending='additive', opacity=0.7)
+        if atlas is not None:
+            viewer.add_labels(atlas, name='Atlas regions', opacity=0.7)
+        if data is not None:
+            viewer.add_image(data, name='Intensity data', blending='additive',
+                             scale=tuple(h/d for h, d in zip(heatmap.shape, data.shape)), opacity=0.7)
+        napari.run()
 
 
 def compare_stitching(stitcher1, stitcher2, loc=None, n_proj=0, dim=0, downsample=2, color=False, rel_map=False):
@@ -366,7 +422,8 @@ def compare_stitching(stitcher1, stitcher2, loc=None, n_proj=0, dim=0, downsampl
 
 def reconstruct_colored_projection(apr, parts, loc=None, dim=0, n_proj=0, downsample=1, threshold=None, plot=True):
     """
-    Compare two stitching at a given position `loc` for a given dimension `dim`.
+    Reconstruct a colored max-projection at a given position `loc` for a given dimension `dim`. The intensity is
+    encoded as the value and the position of the maximum along `dim` as the hue.
 
     Parameters
     ----------
@@ -375,27 +432,30 @@ def reconstruct_colored_projection(apr, parts, loc=None, dim=0, n_proj=0, downsa
     parts: pyapr.ParticleData
         apr particles
     loc: int
-        position in the given dimension
+        position in the given dimension, in pixels of the downsampled grid (i.e. loc*downsample at full resolution)
     dim: int
-        dimension to use for comparison
+        dimension along which the projection is computed
     n_proj: int
-        number of plane to perform the max-projection
+        number of planes of the downsampled grid used for the max-projection (i.e. n_proj*downsample planes at full
+        resolution)
     downsample: int
         downsampling factor for the reconstruction
-    color: bool
-        option to display in color
-    rel_map: bool
-        overlay reliability map on the reconstructed data
+    threshold: float
+        if not None, pixels with an intensity below threshold are displayed without color
+    plot: bool
+        option to plot the reconstructed projection
 
     Returns
     -------
-    None
+    rgb: ndarray
+        colored max-projection
     """
 
-    level_delta = int(-np.sign(downsample) * np.log2(np.abs(downsample)))
+    level_delta = _downsample_level(downsample)
 
+    # Reconstruct directly at the downsampled resolution instead of the full resolution
+    apr_shape = [int(np.ceil(x * 2.0 ** level_delta)) for x in apr.shape()]
     if loc is None:
-        apr_shape = apr.shape()
         loc = int(apr_shape[dim] / 2)
 
     if loc > apr_shape[dim]:
@@ -403,6 +463,7 @@ def reconstruct_colored_projection(apr, parts, loc=None, dim=0, n_proj=0, downsa
 
     locf = min(loc+n_proj, apr_shape[dim])
     patch = pyapr.ReconPatch()
+    patch.level_delta = level_delta
     if dim == 0:
         patch.z_begin = loc
         patch.z_end = locf
@@ -413,7 +474,8 @@ def reconstruct_colored_projection(apr, parts, loc=None, dim=0, n_proj=0, downsa
         patch.x_begin = loc
         patch.x_end = locf
 
-    data = pyapr.reconstruction.reconstruct_constant(apr, parts, patch=patch)
+    tree_parts = pyapr.tree.fill_tree_max(apr, parts) if level_delta < 0 else None
+    data = pyapr.reconstruction.reconstruct_constant(apr, parts, tree_parts=tree_parts, patch=patch)
 
     V = data.max(axis=dim)
     S = np.ones_like(V) * 0.7
@@ -445,7 +507,8 @@ class tileViewer():
                  database,
                  segmentation: bool=False,
                  cells=None,
-                 atlaser=None):
+                 atlaser=None,
+                 cache_size=None):
         """
 
         Parameters
@@ -460,6 +523,10 @@ class tileViewer():
             cells center to be displayed.
         atlaser: tileAtlaser
             tileAtlaser object containing the Atlas to be displayed.
+        cache_size: int
+            maximum number of tiles kept in cache between displays, least recently used tiles are evicted first
+            (default: None, no limit). Note that displayed layers still hold their tile data, so this only bounds the
+            memory kept once the layers are released.
         """
         self.tiles = tiles
 
@@ -471,24 +538,29 @@ class tileViewer():
             self.database = pd.read_csv(database)
         else:
             raise TypeError('Error: unknown type for database.')
+        # Index the tile positions by (row, col) so that lookups do not scan the whole dataframe
+        self._positions = {(int(t.row), int(t.col)): np.array([t.ABS_D, t.ABS_V, t.ABS_H], dtype=float)
+                           for t in self.database.itertuples()}
 
         self.nrow = tiles.nrow
         self.ncol = tiles.ncol
-        self.loaded_ind = []
-        self.loaded_tiles = {}
+        self.cache_size = cache_size
+        self.loaded_tiles = OrderedDict()
         self.segmentation = segmentation
         self.loaded_segmentation = {}
         self.cells = cells
         self.atlaser = atlaser
 
-    def get_layers_all_tiles(self, downsample=1, **kwargs):
+    def get_layers_all_tiles(self, downsample=1, color=False, **kwargs):
         """
-        Display all parsed tiles.
+        Get the Napari layers for all parsed tiles.
 
         Parameters
         ----------
         downsample: int
             downsampling parameter for APRSlicer (1: full resolution, 2: 2x downsampling, 4: 4x downsampling..etc)
+        color: bool
+            option to display in color
         kwargs: dict
             dictionary passed to Napari for custom option
 
@@ -498,102 +570,39 @@ class tileViewer():
             list of layers to be displayed by Napari
         """
 
-        # Compute layers to be displayed by Napari
-        layers = []
-
-        # Convert downsample to level delta
-        level_delta = int(-np.sign(downsample)*np.log2(np.abs(downsample)))
-
-        for tile in self.tiles:
-            # Load tile if not loaded, else use cached tile
-            ind = np.ravel_multi_index((tile.row, tile.col), dims=(self.nrow, self.ncol))
-            if self._is_tile_loaded(tile.row, tile.col):
-                apr, parts = self.loaded_tiles[ind]
-                if self.segmentation:
-                    cc = self.loaded_segmentation[ind]
-            else:
-                tile.load_tile()
-                apr, parts = tile.apr, tile.parts
-                self.loaded_ind.append(ind)
-                self.loaded_tiles[ind] = apr, parts
-                if self.segmentation:
-                    tile.load_segmentation()
-                    cc = tile.parts_cc
-                    self.loaded_segmentation[ind] = cc
+        return list(self._iter_tile_layers(downsample=downsample, color=color, **kwargs))
 
-
-            position = self._get_tile_position(tile.row, tile.col)
-            if level_delta != 0:
-                position = [x/downsample for x in position]
-            layers.append(apr_to_napari_Image(apr, parts,
-                                              mode='constant',
-                                              name='Tile [{}, {}]'.format(tile.row, tile.col),
-                                              translate=position,
-                                              opacity=0.7,
-                                              level_delta=level_delta,
-                                              **kwargs))
-            if self.segmentation:
-                layers.append(apr_to_napari_Labels(apr, cc,
-                                                   mode='constant',
-                                                   name='Segmentation [{}, {}]'.format(tile.row, tile.col),
-                                                   translate=position,
-                                                   level_delta=level_delta,
-                                                   opacity=0.7))
-        if self.cells is not None:
-            par = apr.get_parameters()
-            layers.append(Points(self.cells, opacity=0.7, name='Cells center',
-                                 scale=[par.dz/downsample, par.dx/downsample, par.dy/downsample]))
-
-        if self.atlaser is not None:
-            layers.append(Labels(self.atlaser.atlas, opacity=0.7, name='Atlas',
-                                 scale=[self.atlaser.z_downsample/downsample,
-                                        self.atlaser.y_downsample/downsample,
-                                        self.atlaser.x_downsample/downsample]))
-
-        return layers
-
-    def display_all_tiles(self, pyramidal=True, downsample=1, color=False, **kwargs):
+    def _iter_tile_layers(self, downsample=1, color=False, **kwargs):
         """
-        Display all parsed tiles.
+        Generator yielding the Napari layers for all parsed tiles, one tile at a time.
 
         Parameters
         ----------
-        pyramidal: bool
-            option to have a slider that controls the displayed resolution
         downsample: int
             downsampling parameter for APRSlicer (1: full resolution, 2: 2x downsampling, 4: 4x downsampling..etc)
+        color: bool
+            option to display in color
         kwargs: dict
             dictionary passed to Napari for custom option
 
         Returns
         -------
-        None
+        Generator containing the napari layers.
         """
 
-        # Compute layers to be displayed by Napari
-        layers = []
-
         # Convert downsample to level delta
-        level_delta = int(-np.sign(downsample)*np.log2(np.abs(downsample)))
+        level_delta = _downsample_level(downsample)
+        # Tile positions are scaled to the resolution actually reconstructed by APRSlicer
+        scale = 2.0 ** level_delta
 
+        par = None
         for tile in self.tiles:
             # Load tile if not loaded, else use cached tile
-            ind = np.ravel_multi_index((tile.row, tile.col), dims=(self.nrow, self.ncol))
-            if self._is_tile_loaded(tile.row, tile.col):
-                apr, parts = self.loaded_tiles[ind]
-                if self.segmentation:
-                    cc = self.loaded_segmentation[ind]
-            else:
-                tile.load_tile()
-                apr, parts = tile.apr, tile.parts
-                self.loaded_ind.append(ind)
-                self.loaded_tiles[ind] = apr, parts
-                if self.segmentation:
-                    tile.load_segmentation()
-                    cc = tile.parts_cc
-                    self.loaded_segmentation[ind] = cc
+            apr, parts, par, cc = self._get_cached_tile(tile)
 
             position = self._get_tile_position(tile.row, tile.col)
+            position = position * scale
+            tile_scale = [par.dz, par.dx, par.dy]
 
             if color:
                 blending = 'additive'
@@ -611,36 +620,53 @@ class tileViewer():
                 cmap = 'gray'
                 blending = 'translucent'
 
-            if level_delta != 0:
-                position = [x/downsample for x in position]
-            layers.append(apr_to_napari_Image(apr, parts,
-                                              mode='constant',
-                                              name='Tile [{}, {}]'.format(tile.row, tile.col),
-                                              translate=position,
-                                              opacity=0.7,
-                                              level_delta=level_delta,
-                                              **kwargs))
+            yield apr_to_napari_Image(apr, parts,
+                                      mode='constant',
+                                      name='Tile [{}, {}]'.format(tile.row, tile.col),
+                                      translate=position,
+                                      scale=tile_scale,
+                                      opacity=0.7,
+                                      level_delta=level_delta,
+                                      colormap=cmap,
+                                      blending=blending,
+                                      **kwargs)
             if self.segmentation:
-                layers.append(apr_to_napari_Labels(apr, cc,
-                                                   mode='constant',
-                                                   name='Segmentation [{}, {}]'.format(tile.row, tile.col),
-                                                   translate=position,
-                                                   level_delta=level_delta,
-                                                   blending=blending,
-                                                   opacity=0.7))
-        if self.cells is not None:
-            par = apr.get_parameters()
-            layers.append(Points(self.cells, opacity=0.7, name='Cells center',
-                                 scale=[par.dz/downsample, par.dx/downsample, par.dy/downsample]))
+                yield apr_to_napari_Labels(apr, cc,
+                                           mode='constant',
+                                           name='Segmentation [{}, {}]'.format(tile.row, tile.col),
+                                           translate=position,
+                                           scale=tile_scale,
+                                           level_delta=level_delta,
+                                           opacity=0.7)
 
-        if self.atlaser is not None:
-            layers.append(Labels(self.atlaser.atlas, opacity=0.7, name='Atlas',
-                                 scale=[self.atlaser.z_downsample/downsample,
-                                        self.atlaser.y_downsample/downsample,
-                                        self.atlaser.x_downsample/downsample]))
+        yield from self._get_overlay_layers(scale, par)
+
+    def display_all_tiles(self, pyramidal=True, downsample=1, color=False, **kwargs):
+        """
+        Display all parsed tiles.
+
+        Parameters
+        ----------
+        pyramidal: bool
+            option to have a slider that controls the displayed resolution
+        downsample: int
+            downsampling parameter for APRSlicer (1: full resolution, 2: 2x downsampling, 4: 4x downsampling..etc)
+        color: bool
+            option to display in color
+        kwargs: dict
+            dictionary passed to Napari for custom option
+
+        Returns
+        -------
+        None
+        """
+
+        # Layers are added to the viewer as soon as each tile is loaded
+        layers = self._iter_tile_layers(downsample=downsample, color=color, **kwargs)
 
         # Display layers
         if pyramidal:
+            level_delta = _downsample_level(downsample)
             display_layers_pyramidal(layers, level_delta)
         else:
             display_layers(layers)
@@ -651,8 +677,8 @@ class tileViewer():
 
         Parameters
         ----------
-        coords: list
-            list of tuples (row, col) containing the tile coordinate to display.
+        coords: list, ndarray
+            list of tuples (row, col) or array of shape (n, 2) containing the tile coordinates to display.
         downsample: int
             downsampling parameter for APRSlicer (1: full resolution, 2: 2x downsampling, 4: 4x downsampling..etc)
         kwargs: dict
@@ -669,29 +695,27 @@ class tileViewer():
         layers = []
 
         # Convert downsample to level delta
-        level_delta = int(-np.sign(downsample) * np.log2(np.abs(downsample)))
-
+        level_delta = _downsample_level(downsample)
+        # Tile positions are scaled to the resolution actually reconstructed by APRSlicer
+        scale = 2.0 ** level_delta
+
+        # Accept a single (row, col) pair, a list of pairs or an array of shape (n, 2) or (2, n)
+        coords = np.atleast_2d(np.asarray(coords, dtype=int))
+        if coords.shape[1] != 2 and coords.shape[0] == 2:
+            coords = coords.T
+        if coords.shape[1] != 2:
+            raise ValueError('Error: coords should contain (row, col) pairs.')
+        coords = set(map(tuple, coords.tolist()))
+
+        par = None
         for tile in self.tiles:
             if (tile.row, tile.col) in coords:
                 # Load tile if not loaded, else use cached tile
-                ind = np.ravel_multi_index((tile.row, tile.col), dims=(self.nrow, self.ncol))
-                if self._is_tile_loaded(tile.row, tile.col):
-                    apr, parts = self.loaded_tiles[ind]
-                    if self.segmentation:
-                        cc = self.loaded_segmentation[ind]
-                else:
-                    tile.load_tile()
-                    apr, parts = tile.apr, tile.parts
-                    self.loaded_ind.append(ind)
-                    self.loaded_tiles[ind] = apr, parts
-                    if self.segmentation:
-                        tile.load_segmentation()
-                        cc = tile.parts_cc
-                        self.loaded_segmentation[ind] = cc
+                apr, parts, par, cc = self._get_cached_tile(tile)
 
                 position = self._get_tile_position(tile.row, tile.col)
-                if level_delta != 0:
-                    position = [x / downsample for x in position]
+                position = position * scale
+                tile_scale = [par.dz, par.dx, par.dy]
 
                 if color:
                     blending = 'additive'
@@ -713,6 +737,7 @@ class tileViewer():
                                                   mode='constant',
                                                   name='Tile [{}, {}]'.format(tile.row, tile.col),
                                                   translate=position,
+                                                  scale=tile_scale,
                                                   opacity=0.7,
                                                   level_delta=level_delta,
                                                   colormap=cmap,
@@ -723,18 +748,11 @@ class tileViewer():
                                                        mode='constant',
                                                        name='Segmentation [{}, {}]'.format(tile.row, tile.col),
                                                        translate=position,
+                                                       scale=tile_scale,
                                                        level_delta=level_delta,
                                                        opacity=0.7))
-        if self.cells is not None:
-            par = apr.get_parameters()
-            layers.append(Points(self.cells, opacity=0.7, name='Cells center',
-                                 scale=[par.dz / downsample, par.dx / downsample, par.dy / downsample]))
 
-        if self.atlaser is not None:
-            layers.append(Labels(self.atlaser.atlas, opacity=0.7, name='Atlas',
-                                 scale=[self.atlaser.z_downsample / downsample,
-                                        self.atlaser.y_downsample / downsample,
-                                        self.atlaser.x_downsample / downsample]))
+        layers.extend(self._get_overlay_layers(scale, par))
 
         # Display layers
         if pyramidal:
@@ -764,14 +782,15 @@ class tileViewer():
         layers = []
 
         # Convert downsample to level delta
-        level_delta = int(-np.sign(downsample)*np.log2(np.abs(downsample)))
+        level_delta = _downsample_level(downsample)
+        # Tile positions are scaled to the resolution actually reconstructed by APRSlicer
+        scale = 2.0 ** level_delta
 
         for tile in self.tiles:
             tile.lazy_load_tile(level_delta=level_delta)
             position = self._get_tile_position(tile.row, tile.col)
 
-            if level_delta != 0:
-                position = [x/downsample for x in position]
+            position = position * scale
 
             if color:
                 blending = 'additive'
@@ -799,51 +818,92 @@ class tileViewer():
 
         display_layers(layers)
 
-    def _is_tile_loaded(self, row, col):
+    def _get_cached_tile(self, tile):
         """
-        Returns True is tile is loaded, False otherwise.
+        Returns the tile data from the cache, loading the tile (and its segmentation) if it is not cached yet.
 
+        Parameters
+        ----------
+        tile: tileLoader
+            tile to be loaded
+
+        Returns
+        -------
+        apr, parts, par, cc: tuple
+            APR, particles, APR parameters and connected component particles (None if segmentation is not displayed)
         """
-        ind = np.ravel_multi_index((row, col), dims=(self.nrow, self.ncol))
-        return ind in self.loaded_ind
+        ind = self._get_tile_index(tile.row, tile.col)
+        cc = None
+        if ind in self.loaded_tiles:
+            self.loaded_tiles.move_to_end(ind)
+            apr, parts, par = self.loaded_tiles[ind]
+            if self.segmentation:
+                cc = self.loaded_segmentation[ind]
+        else:
+            if self.segmentation:
+                # Tile and segmentation are stored in the same file and read in a single pass
+                tile.load_tile_and_segmentation()
+                cc = tile.parts_cc
+                self.loaded_segmentation[ind] = cc
+            else:
+                tile.load_tile()
+            apr, parts, par = tile.apr, tile.parts, tile.apr.get_parameters()
+            self.loaded_tiles[ind] = apr, parts, par
+            self._evict_tiles()
+
+        return apr, parts, par, cc
 
-    def _load_tile(self, row, col):
+    def _get_overlay_layers(self, scale, par):
         """
-        Load the tile at position [row, col].
+        Returns the cells and atlas layers (if any) scaled to the displayed resolution. A new layer is built at each
+        call so that layers returned by previous calls keep their own scale (the data itself is not copied).
 
+        Parameters
+        ----------
+        scale: float
+            scaling factor corresponding to the displayed resolution
+        par: pyapr.APRParameters
+            parameters of the displayed tiles (None if no tile was displayed)
+
+        Returns
+        -------
+        layers: list[napari.Layer]
+            list of overlay layers
         """
-        df = self.database
-        path = df[(df['row'] == row) & (df['col'] == col)]['path'].values[0]
-        if self.tiles.type == 'tiff2D':
-            files = glob(os.path.join(path, '*.tif'))
-            im = imread(files[0])
-            u = np.zeros((len(files), *im.shape))
-            u[0] = im
-            files.pop(0)
-            for i, file in enumerate(files):
-                u[i+1] = imread(file)
-            return self._get_apr(u)
-        elif self.tiles.type == 'tiff3D':
-            u = imread(path)
-            return self._get_apr(u)
-        elif self.tiles.type == 'apr':
-            apr = pyapr.APR()
-            parts = pyapr.ShortParticles()
-            pyapr.io.read(path, apr, parts)
-            u = (apr, parts)
-            return u
-        else:
-            raise TypeError('Error: image type {} not supported.'.format(self.type))
+        layers = []
+        if self.cells is not None and par is not None:
+            layers.append(Points(self.cells, opacity=0.7, name='Cells center',
+                                 scale=[par.dz * scale, par.dx * scale, par.dy * scale]))
 
-    def _get_tile_position(self, row, col):
+        if self.atlaser is not None:
+            layers.append(Labels(self.atlaser.atlas, opacity=0.7, name='Atlas',
+                                 scale=[self.atlaser.z_downsample * scale,
+                                        self.atlaser.y_downsample * scale,
+                                        self.atlaser.x_downsample * scale]))
+
+        return layers
+
+    def _evict_tiles(self):
         """
-        Parse tile position in the database.
+        Remove the least recently used tiles from the cache until it holds at most cache_size tiles.
 
         """
-        df = self.database
-        tile_df = df[(df['row'] == row) & (df['col'] == col)]
-        px = tile_df['ABS_H'].values[0]
-        py = tile_df['ABS_V'].values[0]
-        pz = tile_df['ABS_D'].values[0]
+        if self.cache_size is None:
+            return
+        while len(self.loaded_tiles) > self.cache_size:
+            ind, _ = self.loaded_tiles.popitem(last=False)
+            self.loaded_segmentation.pop(ind, None)
 
-        return [pz, py, px]
\ No newline at end of file
+    def _get_tile_index(self, row, col):
+        """
+        Returns the linear index of tile at position [row, col] (row-major order).
+
+        """
+        return int(row) * self.ncol + int(col)
+
+    def _get_tile_position(self, row, col):
+        """
+        Returns the tile position (precomputed from the database).
+
+        """
+        return self._positions[(row, col)]
\ No newline at end of file
@@ -14,6 +14,7 @@ setup(
         'tqdm',
         'pandas',
         'scikit-image',
+        'tifffile',
         'scikit-learn',
         'opencv-contrib-python-headless',
         'dill',
@@ -0,0 +1,61 @@
+"""
+Test script for the background tile loading used by the converter.
+
+By using this code you agree to the terms of the software license agreement.
+
+© Copyright 2020 Wyss Center for Bio and Neuro Engineering – All rights reserved
+"""
+
+import threading
+
+from paprica.converter import _prefetch_tiles
+
+
+class _StubTile():
+    """
+    Minimal tile recording the order in which tiles are loaded.
+    """
+    def __init__(self, index, loaded):
+        self.index = index
+        self.loaded = loaded
+        self.memmap_dir = None
+        self.is_loaded = False
+
+    def load_tile(self):
+        self.loaded.append(self.index)
+        self.is_loaded = True
+
+
+def test_prefetch_tiles():
+    loaded = []
+    tiles = [_StubTile(i, loaded) for i in range(5)]
+
+    out = []
+    for tile in _prefetch_tiles(tiles, memmap_dir='tmp'):
+        # At most one tile is loaded ahead of the one being processed
+        assert(tile.is_loaded)
+        assert(max(loaded) <= tile.index + 1)
+        out.append(tile.index)
+
+    assert(out == list(range(5)))
+    assert(loaded == list(range(5)))
+    assert(all(tile.memmap_dir == 'tmp' for tile in tiles))
+
+
+def test_prefetch_tiles_empty():
+    assert(list(_prefetch_tiles([])) == [])
+
+
+def test_prefetch_tiles_background():
+    # The next tile is loaded in a different thread than the one consuming the tiles
+    threads = []
+
+    class _ThreadTile(_StubTile):
+        def load_tile(self):
+            threads.append(threading.get_ident())
+            super().load_tile()
+
+    tiles = [_ThreadTile(i, []) for i in range(3)]
+    list(_prefetch_tiles(tiles))
+
+    assert(threading.get_ident() not in threads)
@@ -0,0 +1,45 @@
+"""
+Test script for loading tiff sequences.
+
+By using this code you agree to the terms of the software license agreement.
+
+© Copyright 2020 Wyss Center for Bio and Neuro Engineering – All rights reserved
+"""
+
+import os
+
+import numpy as np
+import pytest
+import tifffile
+
+import paprica
+
+
+def _write_sequence(path, compression=None):
+    data = np.random.randint(0, 2**16, size=(5, 32, 48), dtype='uint16')
+    files = []
+    for i, frame in enumerate(data):
+        f = os.path.join(path, 'frame_{:03d}.tif'.format(i))
+        tifffile.imwrite(f, frame, compression=compression)
+        files.append(f)
+    return data, files
+
+
+@pytest.mark.parametrize('compression', [None, 'zlib'])
+@pytest.mark.parametrize('use_memmap', [False, True])
+def test_load_sequence(tmp_path, compression, use_memmap):
+    data, files = _write_sequence(str(tmp_path), compression=compression)
+    memmap_dir = str(tmp_path) if use_memmap else None
+
+    v = paprica.loader.load_sequence(files, memmap_dir=memmap_dir)
+
+    assert(v.shape == data.shape)
+    assert(v.dtype == data.dtype)
+    assert((np.asarray(v) == data).all())
+
+
+def test_load_sequence_empty():
+    v = paprica.loader.load_sequence([])
+
+    assert(v.size == 0)
+    assert(v.ndim == 3)
@@ -0,0 +1,77 @@
+"""
+Test script for the ClearScope running pipeline settings and tile position parsing.
+
+By using this code you agree to the terms of the software license agreement.
+
+© Copyright 2020 Wyss Center for Bio and Neuro Engineering – All rights reserved
+"""
+
+import numpy as np
+import pytest
+
+import paprica
+from paprica.parser import _RE_ACQ, _parse_setting_value, _parse_settings_lines
+
+
+@pytest.mark.parametrize('value, expected', [('True', True),
+                                             ('False', False),
+                                             ('4', 4),
+                                             ('-3', -3),
+                                             ('25.5', 25.5),
+                                             ('-0.25', -0.25),
+                                             ('1e-3', 1e-3),
+                                             ('my acquisition', 'my acquisition'),
+                                             ('', '')])
+def test_parse_setting_value(value, expected):
+    parsed = _parse_setting_value(value)
+
+    assert(parsed == expected)
+    assert(type(parsed) == type(expected))
+
+
+@pytest.mark.parametrize('line, expected', [('ScanGridX = 4\n', ('ScanGridX', '4')),
+                                            ('VSThrowAwayXRight = 25.5\n', ('VSThrowAwayXRight', '25.5')),
+                                            ('StageOffset=-3\n', ('StageOffset', '-3')),
+                                            ('Name = my acquisition  \n', ('Name', 'my acquisition')),
+                                            ('Comment = \n', ('Comment', '')),
+                                            ('[Settings]\n', None),
+                                            ('\n', None)])
+def test_acquisition_settings_regex(line, expected):
+    m = _RE_ACQ.match(line)
+
+    if expected is None:
+        assert(m is None)
+    else:
+        assert(m.groups() == expected)
+
+
+
+def test_parse_settings_lines():
+    lines = ['[Settings]\n', 'ScanGridX = 4\n', 'ScanGridY = 3\n', 'VSThrowAwayXRight = 25.5\n',
+             'StageOffset = -3\n', 'UseDeconvolution = False\n', 'Name = my acquisition\n', '\n']
+
+    acq_param = _parse_settings_lines(lines)
+
+    assert(acq_param == {'ScanGridX': 4, 'ScanGridY': 3, 'VSThrowAwayXRight': 25.5, 'StageOffset': -3,
+                         'UseDeconvolution': False, 'Name': 'my acquisition'})
+
+def _row_col_reference(n, ncol):
+    # Formula used before the integer rewrite
+    col = np.absolute(np.mod(n - ncol - 1, 2 * ncol) - ncol + 0.5) + 0.5
+    row = np.ceil(n / ncol)
+    return int(row - 1), int(col - 1)
+
+
+@pytest.mark.parametrize('ncol', range(1, 25))
+def test_get_row_col(ncol):
+    # Only the attributes used by _get_row_col are set, __init__ waits for the acquisition to start
+    pipeline = object.__new__(paprica.runner.clearscopeRunningPipeline)
+    pipeline.ncol = ncol
+    parser = object.__new__(paprica.parser.clearscopeParser)
+    parser.ncol = ncol
+
+    for n in range(1, 800):
+        expected = _row_col_reference(n, ncol)
+        path = 'acquisition/000000_{:06d}___1c'.format(n)
+        assert(pipeline._get_row_col(path) == expected)
+        assert(parser._get_row_col(n) == expected)